@@ -1,11 +1,9 @@
-from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.api import deps
 from app.core import security
-from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, User as UserSchema, LoginSchema
 
@@ -51,16 +49,13 @@ async def create_user(
     user = User(
         email=user_in.email,
         username=user_in.username,
-        password_hash=security.get_password_hash(user_in.password),
+        password_hash=await security.get_password_hash(user_in.password),
     )
     db.add(user)
     await db.commit()
     await db.refresh(user)
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
-    )
+    access_token = security.create_access_token(user.id)
     
     return {
         "user": UserSchema.model_validate(user),
@@ -79,7 +74,7 @@ async def login(
     result = await db.execute(select(User).filter(User.username == login_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not security.verify_password(login_data.password, user.password_hash):
+    if not user or not await security.verify_password(login_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -90,10 +85,13 @@ async def login(
             }
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        user.id, expires_delta=access_token_expires
-    )
+    # Upgrade hashes from an older scheme or cost now that we have the password
+    if security.password_needs_rehash(user.password_hash):
+        user.password_hash = await security.get_password_hash(login_data.password)
+        await db.commit()
+        await db.refresh(user)
+    
+    access_token = security.create_access_token(user.id)
     
     return {
         "user": UserSchema.model_validate(user),
@@ -1,5 +1,7 @@
-from pydantic_settings import BaseSettings
-from pydantic import Field, field_validator
+from functools import lru_cache
+from typing import Literal, Tuple
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field, field_validator, model_validator
 import os
 import warnings
 
@@ -12,6 +14,15 @@ class Settings(BaseSettings):
     )
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     
+    # Password hashing scheme for new hashes. Existing hashes of either scheme
+    # still verify and are upgraded to this scheme on the next login.
+    PASSWORD_HASH_SCHEME: Literal["argon2", "bcrypt"] = "argon2"
+    
+    # bcrypt cost factor (2^rounds iterations), used when PASSWORD_HASH_SCHEME
+    # is "bcrypt". Lower it (e.g. 10) for dev/staging to speed up signup/login;
+    # keep 12+ in production. bcrypt only accepts 4-31, so other values fail at startup.
+    BCRYPT_ROUNDS: int = Field(default=12, ge=4, le=31)
+    
     @field_validator('SECRET_KEY')
     @classmethod
     def validate_secret_key(cls, v: str) -> str:
@@ -69,8 +80,32 @@ class Settings(BaseSettings):
     # For production, specify exact origins: "https://yourdomain.com,https://www.yourdomain.com"
     CORS_ORIGINS: str = "*"  # Allow all origins for development
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    # CORS_ORIGINS split into a tuple once at startup (derived, do not set directly).
+    # An empty CORS_ORIGINS falls back to the common localhost dev origins.
+    CORS_ORIGINS_LIST: Tuple[str, ...] = ()
+    
+    @model_validator(mode='after')
+    def split_cors_origins(self) -> "Settings":
+        """Pre-split CORS_ORIGINS so callers never re-parse the string."""
+        origins = tuple(
+            origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()
+        )
+        if not origins:
+            origins = (
+                "http://localhost:5173",
+                "http://localhost:3000",
+                "http://127.0.0.1:5173",
+                "http://127.0.0.1:3000",
+            )
+        # Settings is frozen, so bypass the immutability guard for this derived field
+        object.__setattr__(self, 'CORS_ORIGINS_LIST', origins)
+        return self
+    
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, frozen=True)
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide Settings, reading the environment and .env only once."""
+    return Settings()
 
-settings = Settings()
+settings = get_settings()
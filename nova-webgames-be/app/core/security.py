@@ -1,6 +1,20 @@
-from datetime import datetime, timedelta
-from typing import Optional, Union, Any
-from jose import jwt
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+from typing import Optional, Union, Any, Dict, List, Tuple
+import jwt
 from app.core.config import settings
 
 # Use bcrypt directly instead of passlib
@@ -17,23 +31,210 @@ from app.core.config import settings
 # - Upgrading passlib: 1.7.4 is the latest version (no fix available yet)
 # - Configuring passlib to skip detection: Not easily configurable
 # - Using bcrypt directly: Clean, standard, and works reliably
+#
+# New hashes use Argon2id (argon2-cffi) by default; bcrypt is kept so existing
+# hashes still verify and for deployments that set PASSWORD_HASH_SCHEME=bcrypt.
 import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError
+
+# Optional: orjson serializes the JWT claim set faster than the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: libsodium (PyNaCl) computes the same Argon2id hashes with its
+# SIMD-optimized core. Hashes are interchangeable with argon2-cffi's.
+try:
+    import nacl.pwhash
+    from nacl.exceptions import InvalidkeyError
+    NACL_AVAILABLE = True
+except ImportError:
+    NACL_AVAILABLE = False
 
 ALGORITHM = "HS256"
 
+if ORJSON_AVAILABLE:
+    class _OrjsonJWT(jwt.PyJWT):
+        """PyJWT decoding the claim set with orjson (via its documented override hook)."""
+        
+        def _decode_payload(self, decoded) -> Dict[str, Any]:
+            try:
+                payload = orjson.loads(decoded["payload"])
+            except ValueError as e:
+                raise jwt.DecodeError(f"Invalid payload string: {e}") from e
+            if not isinstance(payload, dict):
+                raise jwt.DecodeError("Invalid payload string: must be a json object")
+            return payload
+    
+    _jwt = _OrjsonJWT()
+    _dumps = orjson.dumps
+else:
+    _jwt = jwt.PyJWT()
+    
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# Hoisted once: these are read on every token mint/verify
+_SECRET_KEY = settings.SECRET_KEY
+_ACCESS_TOKEN_EXPIRE_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Tokens are signed directly rather than through jwt.encode: the header is
+# constant, so it is base64url-encoded once, and the HMAC is keyed once so each
+# token only copies the state with the key pads already absorbed. The output
+# is identical to jwt.encode(..., algorithm="HS256").
+_JWT_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_HMAC_TEMPLATE = hmac.new(_SECRET_KEY.encode("utf-8"), digestmod=hashlib.sha256)
+
+# Argon2id parameters follow the OWASP minimum recommendation
+# (19 MiB memory, 2 iterations, 1 degree of parallelism). libsodium always
+# uses a parallelism of 1, so both backends produce identical parameters.
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST_KIB = 19456
+_argon2_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST_KIB, parallelism=1
+)
+
+def _argon2_hash(password: str) -> str:
+    if NACL_AVAILABLE:
+        return nacl.pwhash.argon2id.str(
+            password.encode('utf-8'),
+            opslimit=ARGON2_TIME_COST,
+            memlimit=ARGON2_MEMORY_COST_KIB * 1024,
+        ).decode('ascii')
+    return _argon2_hasher.hash(password)
+
+def _argon2_verify(hashed_password: str, plain_password: str) -> bool:
+    if NACL_AVAILABLE:
+        try:
+            return nacl.pwhash.verify(
+                hashed_password.encode('utf-8'), plain_password.encode('utf-8')
+            )
+        except InvalidkeyError:
+            # Mismatch, malformed hash, or a variant libsodium lacks (argon2d)
+            return False
+    return _argon2_hasher.verify(hashed_password, plain_password)
+
+# bcrypt's base64 variant puts "./" before the letters instead of "+/" at the end
+_BCRYPT_B64 = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
+    b"./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",
+)
+
+class _SaltPool:
+    """
+    Hands out salt bytes from a buffered CSPRNG block.
+    
+    Refilling 4 KiB at a time amortizes the getrandom() syscall across 256
+    bcrypt salts. The buffer is dropped in forked children so worker processes
+    never share salts.
+    """
+    
+    def __init__(self, size: int = 4096):
+        self._size = size
+        self.reset()
+    
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._pos = 0
+    
+    def take(self, n: int) -> bytes:
+        with self._lock:
+            if self._pos + n > len(self._buffer):
+                self._buffer = secrets.token_bytes(self._size)
+                self._pos = 0
+            chunk = self._buffer[self._pos:self._pos + n]
+            self._pos += n
+            return chunk
+
+_salt_pool = _SaltPool()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_salt_pool.reset)
+
+def _gensalt(rounds: int) -> bytes:
+    """Build a bcrypt "$2b$" salt, equivalent to bcrypt.gensalt(rounds=rounds)."""
+    if not 4 <= rounds <= 31:
+        # Settings already rejects these; kept as a safety net for direct callers
+        return bcrypt.gensalt(rounds=rounds)
+    encoded = base64.b64encode(_salt_pool.take(16))[:22].translate(_BCRYPT_B64)
+    return b"$2b$%02d$" % rounds + encoded
+
+# Default-expiry tokens have their expiry rounded up to this granularity so
+# that repeated token requests for the same subject inside one window reuse the
+# signed token. Rounding up means a token never lives shorter than configured;
+# tokens with an explicit expires_delta keep their exact expiry.
+TOKEN_EXP_BUCKET_SECONDS = 15
+
+# Verified token claims are cached for at most this long (and never past the
+# token's own "exp"), keyed by a short digest of the raw token.
+VERIFY_CACHE_MAXSIZE = 4096
+VERIFY_CACHE_TTL_SECONDS = 60
+
+_verify_cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_verify_cache_lock = threading.Lock()
+
+def _sign(subject: str, exp: int) -> str:
+    to_encode = {"exp": exp, "sub": subject}
+    payload_b64 = base64.urlsafe_b64encode(_dumps(to_encode)).rstrip(b"=")
+    signing_input = _JWT_HEADER_B64 + b"." + payload_b64
+    mac = _HMAC_TEMPLATE.copy()
+    mac.update(signing_input)
+    signature_b64 = base64.urlsafe_b64encode(mac.digest()).rstrip(b"=")
+    return (signing_input + b"." + signature_b64).decode("ascii")
+
+@lru_cache(maxsize=4096)
+def _encode(subject: str, exp_bucket: int) -> str:
+    return _sign(subject, exp_bucket)
+
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    # "exp" is integer POSIX time (RFC 7519), so skip datetime arithmetic entirely
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        # Explicit lifetimes are honoured exactly and bypass the token cache
+        return _sign(str(subject), math.ceil(time.time() + expires_delta.total_seconds()))
+    exp = math.ceil(time.time()) + _ACCESS_TOKEN_EXPIRE_SECONDS
+    return _encode(str(subject), exp + (-exp % TOKEN_EXP_BUCKET_SECONDS))
+
+def verify_access_token(token: str) -> Dict[str, Any]:
+    """
+    Decode and verify a JWT access token, returning its claims.
+    
+    Successful decodes are cached so that repeated requests with the same
+    token skip the signature check. Raises jwt.InvalidTokenError on invalid tokens.
+    """
+    key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    now = time.time()
+    with _verify_cache_lock:
+        cached = _verify_cache.get(key)
+        if cached is not None:
+            expires_at, claims = cached
+            if now < expires_at:
+                _verify_cache.move_to_end(key)
+                return dict(claims)
+            del _verify_cache[key]
     
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    claims = _jwt.decode(token, _SECRET_KEY, algorithms=[ALGORITHM])
+    expires_at = now + VERIFY_CACHE_TTL_SECONDS
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, exp)
+    with _verify_cache_lock:
+        _verify_cache[key] = (expires_at, claims)
+        _verify_cache.move_to_end(key)
+        if len(_verify_cache) > VERIFY_CACHE_MAXSIZE:
+            _verify_cache.popitem(last=False)
+    return dict(claims)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verify a password against a bcrypt hash.
+    Verify a password against an Argon2 or bcrypt hash.
+    
+    The hash scheme is picked from the hash prefix, so bcrypt hashes created
+    before the switch to Argon2 keep working. The check runs in the default
+    thread pool so it does not block the event loop. Malformed hashes fail
+    verification rather than raising.
     
     Uses bcrypt directly instead of passlib to avoid the wrap bug detection
     issue that occurs with passlib 1.7.4 and bcrypt 5.0.0+.
@@ -41,20 +242,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     even though the underlying bcrypt library is secure.
     """
     try:
-        password_bytes = plain_password.encode('utf-8') if isinstance(plain_password, str) else plain_password
-        hash_bytes = hashed_password.encode('utf-8') if isinstance(hashed_password, str) else hashed_password
-        return bcrypt.checkpw(password_bytes, hash_bytes)
-    except Exception:
+        loop = asyncio.get_running_loop()
+        if hashed_password.startswith("$argon2"):
+            return await loop.run_in_executor(
+                None, _argon2_verify, hashed_password, plain_password
+            )
+        password_bytes = plain_password.encode('utf-8')
+        hash_bytes = hashed_password.encode('utf-8')
+        return await loop.run_in_executor(None, bcrypt.checkpw, password_bytes, hash_bytes)
+    except (ValueError, VerificationError):
+        # bcrypt raises ValueError and argon2 raises InvalidHashError (a
+        # ValueError) on malformed hashes; VerificationError means mismatch
         return False
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using the configured scheme (settings.PASSWORD_HASH_SCHEME).
     
-    Uses bcrypt directly with 12 rounds (industry standard).
+    Argon2id is the default. With the bcrypt scheme, uses bcrypt directly with
+    settings.BCRYPT_ROUNDS rounds (12 by default, the industry standard).
+    Hashing runs in the default thread pool so the event loop stays responsive.
     Returns the hash as a UTF-8 string for database storage.
     """
-    password_bytes = password.encode('utf-8') if isinstance(password, str) else password
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    loop = asyncio.get_running_loop()
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        return await loop.run_in_executor(None, _argon2_hash, password)
+    
+    password_bytes = password.encode('utf-8')
+    salt = _gensalt(settings.BCRYPT_ROUNDS)
+    hashed = await loop.run_in_executor(None, bcrypt.hashpw, password_bytes, salt)
     return hashed.decode('utf-8')
+
+async def get_password_hash_batch(passwords: List[str]) -> List[str]:
+    """
+    Hash several passwords concurrently, e.g. when seeding users or fixtures.
+    
+    Each hash runs on the default thread pool; bcrypt, argon2-cffi and
+    libsodium all release the GIL while hashing, so the work spreads across
+    cores. Hashes are returned in the same order as the passwords.
+    """
+    return list(await asyncio.gather(*(get_password_hash(p) for p in passwords)))
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a stored hash should be replaced on the next successful login.
+    
+    True when the hash uses a different scheme than settings.PASSWORD_HASH_SCHEME
+    or was created with different cost parameters than the current ones.
+    """
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        if not hashed_password.startswith("$argon2"):
+            return True
+        return _argon2_hasher.check_needs_rehash(hashed_password)
+    if not hashed_password.startswith("$2"):
+        return True
+    return hashed_password[4:6] != f"{settings.BCRYPT_ROUNDS:02d}"
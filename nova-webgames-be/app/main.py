@@ -80,31 +80,10 @@ app = FastAPI(
     ],
 )
 
-# CORS origins - parse from settings or use defaults
-# For development, allow common localhost origins
+# CORS origins are parsed once by Settings; "*" allows all origins
+# For development, an empty CORS_ORIGINS falls back to common localhost origins
 # In production, this should be restricted to specific domains
-try:
-    cors_origins_str = getattr(settings, 'CORS_ORIGINS', None)
-    if cors_origins_str and cors_origins_str != "*":
-        cors_origins = [origin.strip() for origin in cors_origins_str.split(",") if origin.strip()]
-    elif cors_origins_str == "*":
-        cors_origins = ["*"]
-    else:
-        # Default origins for development
-        cors_origins = [
-            "http://localhost:5173",
-            "http://localhost:3000",
-            "http://127.0.0.1:5173",
-            "http://127.0.0.1:3000",
-        ]
-except Exception:
-    # Fallback to default origins
-    cors_origins = [
-        "http://localhost:5173",
-        "http://localhost:3000",
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:3000",
-    ]
+cors_origins = settings.CORS_ORIGINS_LIST
 
 # Log CORS origins for debugging (remove in production)
 print(f"CORS allowed origins: {cors_origins}")
@@ -126,8 +105,8 @@ async def global_exception_handler(request: Request, exc: Exception):
     origin = request.headers.get("origin", "*")
     
     # Determine allowed origin
-    if cors_origins == ["*"] or origin in cors_origins:
-        allow_origin = origin if cors_origins != ["*"] else "*"
+    if cors_origins == ("*",) or origin in cors_origins:
+        allow_origin = origin if cors_origins != ("*",) else "*"
     else:
         allow_origin = cors_origins[0] if cors_origins else "*"
     
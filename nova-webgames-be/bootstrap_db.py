@@ -5,47 +5,119 @@ Creates the database (if PostgreSQL) and runs migrations.
 """
 import sys
 import os
-import subprocess
-from urllib.parse import urlparse
+import re
+import contextlib
+import functools
+import getpass
+import traceback
 from datetime import datetime
 
-# Only import psycopg2 if needed (for PostgreSQL)
-try:
-    import psycopg2
-    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-    PSYCOPG2_AVAILABLE = True
-except ImportError:
-    PSYCOPG2_AVAILABLE = False
+# scheme://[user[:password]@]host[:port][/database][?query] in a single match.
+# Like urlparse, the user info runs up to the last "@", so it may contain "@".
+DATABASE_URL_RE = re.compile(
+    r"^(?P<scheme>[A-Za-z][A-Za-z0-9+.\-]*)://"
+    r"(?:(?P<user>[^:/?#]*)(?::(?P<password>[^/?#]*))?@)?"
+    r"(?P<host>\[[^\]]*\]|[^:/?#@]*)"
+    r"(?::(?P<port>\d*))?"
+    r"(?:/(?P<database>[^?#]*))?"
+    r"(?:[?#].*)?$"
+)
 
 def parse_database_url(url: str):
     """Parse database URL and return components."""
-    parsed = urlparse(url)
+    match = DATABASE_URL_RE.match(url)
+    if match is None:
+        raise ValueError(f"Invalid database URL: {url}")
+    parts = match.groupdict()
+    port = int(parts["port"]) if parts["port"] else 5432
+    if not 0 <= port <= 65535:
+        raise ValueError(f"Port out of range 0-65535: {port}")
     
     # Handle postgresql+asyncpg:// and postgresql://
-    if url.startswith("postgresql+asyncpg://"):
-        url = url.replace("postgresql+asyncpg://", "postgresql://")
-        parsed = urlparse(url)
+    scheme = parts["scheme"].lower()
+    if scheme == "postgresql+asyncpg":
+        scheme = "postgresql"
     
     return {
-        "scheme": parsed.scheme,
-        "host": parsed.hostname or "localhost",
-        "port": parsed.port or 5432,
-        "user": parsed.username or "postgres",
-        "password": parsed.password or "",
-        "database": parsed.path.lstrip("/") if parsed.path else None,
+        "scheme": scheme,
+        "host": parts["host"].strip("[]").lower() or "localhost",
+        "port": port,
+        "user": parts["user"] or "postgres",
+        "password": parts["password"] or "",
+        "database": parts["database"],
     }
 
-def database_exists(host, port, user, password, database):
-    """Check if PostgreSQL database exists."""
+@functools.lru_cache(maxsize=1)
+def current_os_user():
+    """Return the OS login name, looked up once (used in DATABASE_URL hints)."""
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        # No passwd entry for this UID (e.g. arbitrary-UID containers)
+        return "your_username"
+
+# SQLSTATE class 08 is "connection exception"; 28000/28P01 are invalid
+# authorization specification / invalid password
+CONNECTION_SQLSTATE_CLASS = "08"
+AUTH_FAILURE_SQLSTATES = frozenset({"28000", "28P01"})
+
+def report_connection_error(e, host, port, user):
+    """Print a diagnostic with next steps for a failed PostgreSQL connection."""
+    sqlstate = getattr(getattr(e, "diag", None), "sqlstate", None) or getattr(e, "pgcode", None)
+    if sqlstate:
+        connection_failed = sqlstate.startswith(CONNECTION_SQLSTATE_CLASS)
+        auth_failed = sqlstate in AUTH_FAILURE_SQLSTATES
+    else:
+        # libpq reports connect-time failures without a SQLSTATE (only errors
+        # raised by queries on an open connection carry one), so fall back to
+        # the (English) server/client message
+        error_str = str(e)
+        error_lower = error_str.lower()
+        connection_failed = "connection refused" in error_lower or "could not connect" in error_lower
+        auth_failed = "does not exist" in error_lower or "FATAL" in error_str
+    
+    if connection_failed:
+        print(f"\n✗ Error: Cannot connect to PostgreSQL server at {host}:{port}")
+        print("   PostgreSQL may not be running.")
+        print("\n   To start PostgreSQL:")
+        print("   - macOS (Homebrew): brew services start postgresql@14")
+        print("   - Linux (systemd): sudo systemctl start postgresql")
+        print("   - Or check: pg_isready -h localhost -p 5432")
+    elif auth_failed:
+        print(f"\n✗ Error: PostgreSQL user '{user}' does not exist or authentication failed")
+        print(f"\n   On macOS with Homebrew, the default user is your macOS username.")
+        print(f"   Try updating your DATABASE_URL to use your username instead of 'postgres':")
+        current_user = current_os_user()
+        print(f"   DATABASE_URL=postgresql://{current_user}@localhost:5432/snake_game")
+        print(f"\n   Or create the 'postgres' user:")
+        print(f"   createuser -s postgres")
+    else:
+        print(f"Error connecting to PostgreSQL: {e}")
+
+@contextlib.contextmanager
+def admin_connection(host, port, user, password):
+    """Yield an autocommit connection to the default 'postgres' database."""
+    import psycopg2
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+    
+    conn = psycopg2.connect(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database="postgres"  # Connect to default database
+    )
     try:
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database="postgres"  # Connect to default database
-        )
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        yield conn
+    finally:
+        conn.close()
+
+def database_exists(conn, database):
+    """Check if PostgreSQL database exists."""
+    import psycopg2
+    
+    try:
         cursor = conn.cursor()
         cursor.execute(
             "SELECT 1 FROM pg_database WHERE datname = %s",
@@ -53,74 +125,30 @@ def database_exists(host, port, user, password, database):
         )
         exists = cursor.fetchone() is not None
         cursor.close()
-        conn.close()
         return exists
-    except psycopg2.OperationalError as e:
-        error_str = str(e)
-        if "Connection refused" in error_str or "could not connect" in error_str.lower():
-            print(f"\n✗ Error: Cannot connect to PostgreSQL server at {host}:{port}")
-            print("   PostgreSQL may not be running.")
-            print("\n   To start PostgreSQL:")
-            print("   - macOS (Homebrew): brew services start postgresql@14")
-            print("   - Linux (systemd): sudo systemctl start postgresql")
-            print("   - Or check: pg_isready -h localhost -p 5432")
-        elif "does not exist" in error_str.lower() or "FATAL" in error_str:
-            print(f"\n✗ Error: PostgreSQL user '{user}' does not exist or authentication failed")
-            print(f"\n   On macOS with Homebrew, the default user is your macOS username.")
-            print(f"   Try updating your DATABASE_URL to use your username instead of 'postgres':")
-            import getpass
-            current_user = getpass.getuser()
-            print(f"   DATABASE_URL=postgresql://{current_user}@localhost:5432/snake_game")
-            print(f"\n   Or create the 'postgres' user:")
-            print(f"   createuser -s postgres")
-        else:
-            print(f"Error checking database existence: {e}")
-        return False
+    except psycopg2.OperationalError:
+        # Let bootstrap_postgresql() classify it with report_connection_error()
+        raise
     except Exception as e:
         print(f"Error checking database existence: {e}")
         return False
 
-def create_database(host, port, user, password, database):
+def create_database(conn, database):
     """Create PostgreSQL database."""
+    import psycopg2.errors
+    
     try:
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database="postgres"  # Connect to default database
-        )
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         cursor = conn.cursor()
         cursor.execute(f'CREATE DATABASE "{database}"')
         cursor.close()
-        conn.close()
         print(f"✓ Database '{database}' created successfully")
         return True
-    except psycopg2.OperationalError as e:
-        error_str = str(e)
-        if "Connection refused" in error_str or "could not connect" in error_str.lower():
-            print(f"\n✗ Error: Cannot connect to PostgreSQL server at {host}:{port}")
-            print("   PostgreSQL may not be running.")
-            print("\n   To start PostgreSQL:")
-            print("   - macOS (Homebrew): brew services start postgresql@14")
-            print("   - Linux (systemd): sudo systemctl start postgresql")
-            print("   - Or check: pg_isready -h localhost -p 5432")
-        elif "does not exist" in error_str.lower() or "FATAL" in error_str:
-            print(f"\n✗ Error: PostgreSQL user '{user}' does not exist or authentication failed")
-            print(f"\n   On macOS with Homebrew, the default user is your macOS username.")
-            print(f"   Try updating your DATABASE_URL to use your username instead of 'postgres':")
-            import getpass
-            current_user = getpass.getuser()
-            print(f"   DATABASE_URL=postgresql://{current_user}@localhost:5432/snake_game")
-            print(f"\n   Or create the 'postgres' user:")
-            print(f"   createuser -s postgres")
-        else:
-            print(f"Error creating database: {e}")
-        return False
     except psycopg2.errors.DuplicateDatabase:
         print(f"✓ Database '{database}' already exists")
         return True
+    except psycopg2.OperationalError:
+        # Let bootstrap_postgresql() classify it with report_connection_error()
+        raise
     except Exception as e:
         print(f"Error creating database: {e}")
         return False
@@ -130,58 +158,28 @@ def run_migrations():
     script_dir = os.path.dirname(os.path.abspath(__file__))
     print(f"Running migrations from: {script_dir}")
     
-    # Try to use venv's alembic if available
-    venv_alembic = os.path.join(script_dir, "venv", "bin", "alembic")
-    if os.path.exists(venv_alembic):
-        alembic_cmd = venv_alembic
-        print(f"Using venv alembic: {alembic_cmd}")
-    else:
-        alembic_cmd = "alembic"
-        print(f"Using system alembic: {alembic_cmd}")
+    # Run Alembic in-process rather than spawning the alembic CLI, which would
+    # start a fresh interpreter and re-import SQLAlchemy and the app models
+    from alembic import command
+    from alembic.config import Config
     
-    # Check if alembic exists
-    if not os.path.exists(alembic_cmd) and alembic_cmd != "alembic":
-        # Try to find alembic in PATH
-        import shutil
-        alembic_path = shutil.which("alembic")
-        if alembic_path:
-            alembic_cmd = alembic_path
-            print(f"Found alembic in PATH: {alembic_cmd}")
-        else:
-            print("Error: alembic command not found. Make sure you're in a virtual environment")
-            print("or install dependencies with: pip install -r requirements.txt")
-            return False
+    alembic_cfg = Config(os.path.join(script_dir, "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", os.path.join(script_dir, "alembic"))
     
     print("Executing: alembic upgrade head")
+    # Relative SQLite paths in DATABASE_URL are resolved against the backend dir
+    previous_cwd = os.getcwd()
     try:
-        result = subprocess.run(
-            [alembic_cmd, "upgrade", "head"],
-            cwd=script_dir,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=60  # 60 second timeout to prevent hanging
-        )
+        os.chdir(script_dir)
+        command.upgrade(alembic_cfg, "head")
         print("✓ Database migrations applied successfully")
-        if result.stdout:
-            print("Migration output:")
-            print(result.stdout)
         return True
-    except subprocess.TimeoutExpired:
-        print("✗ ERROR: Migration command timed out after 60 seconds")
-        print("This suggests the migration is hanging or taking too long")
-        return False
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"✗ Error running migrations: {e}")
-        if e.stdout:
-            print(f"stdout: {e.stdout}")
-        if e.stderr:
-            print(f"stderr: {e.stderr}")
-        return False
-    except FileNotFoundError:
-        print("✗ Error: alembic command not found. Make sure you're in a virtual environment")
-        print("or install dependencies with: pip install -r requirements.txt")
+        traceback.print_exc()
         return False
+    finally:
+        os.chdir(previous_cwd)
 
 def bootstrap_sqlite():
     """Bootstrap SQLite database (just run migrations)."""
@@ -206,7 +204,10 @@ def bootstrap_sqlite():
 
 def bootstrap_postgresql(db_info):
     """Bootstrap PostgreSQL database."""
-    if not PSYCOPG2_AVAILABLE:
+    # Only import psycopg2 here, so SQLite setups never load it (or libpq)
+    try:
+        import psycopg2
+    except ImportError:
         print("Error: psycopg2 is required for PostgreSQL but not installed.")
         print("Install it with: pip install psycopg2-binary")
         return False
@@ -216,27 +217,21 @@ def bootstrap_postgresql(db_info):
     print(f"User: {db_info['user']}")
     print(f"Database: {db_info['database']}")
     
-    # Check if database exists
-    print("\nChecking if database exists...")
-    if database_exists(
-        db_info['host'],
-        db_info['port'],
-        db_info['user'],
-        db_info['password'],
-        db_info['database']
-    ):
-        print(f"✓ Database '{db_info['database']}' already exists")
-    else:
-        print(f"Database '{db_info['database']}' does not exist")
-        print("Creating database...")
-        if not create_database(
-            db_info['host'],
-            db_info['port'],
-            db_info['user'],
-            db_info['password'],
-            db_info['database']
-        ):
-            return False
+    host, port, user = db_info['host'], db_info['port'], db_info['user']
+    try:
+        # Reuse one admin connection for the existence check and the create
+        with admin_connection(host, port, user, db_info['password']) as conn:
+            print("\nChecking if database exists...")
+            if database_exists(conn, db_info['database']):
+                print(f"✓ Database '{db_info['database']}' already exists")
+            else:
+                print(f"Database '{db_info['database']}' does not exist")
+                print("Creating database...")
+                if not create_database(conn, db_info['database']):
+                    return False
+    except psycopg2.OperationalError as e:
+        report_connection_error(e, host, port, user)
+        return False
     
     # Run migrations
     print("\nRunning migrations...")
@@ -260,7 +255,6 @@ def main():
         print()
     except Exception as e:
         print(f"✗ ERROR: Failed to load settings: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
     
@@ -276,7 +270,6 @@ def main():
         print()
     except Exception as e:
         print(f"✗ ERROR: Failed to parse database URL: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
     
@@ -295,7 +288,6 @@ def main():
             sys.exit(1)
     except Exception as e:
         print(f"✗ ERROR: Exception during bootstrap: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
     
@@ -65,7 +65,7 @@ async def test_user(test_db: AsyncSession) -> User:
     user = User(
         username="testuser",
         email="test@example.com",
-        password_hash=security.get_password_hash("testpassword123"),
+        password_hash=await security.get_password_hash("testpassword123"),
     )
     test_db.add(user)
     await test_db.commit()
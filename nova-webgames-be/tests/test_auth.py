@@ -160,6 +160,29 @@ class TestLogin:
         data = response.json()
         assert "error" in data["detail"]
         assert data["detail"]["error"]["code"] == "INVALID_CREDENTIALS"
+    
+    async def test_login_upgrades_legacy_bcrypt_hash(self, client: AsyncClient, test_db: AsyncSession):
+        """Test that a bcrypt hash is replaced with an Argon2 hash on login"""
+        import bcrypt
+        user = User(
+            username="legacyuser",
+            email="legacy@example.com",
+            password_hash=bcrypt.hashpw(b"legacypass123", bcrypt.gensalt(rounds=4)).decode("utf-8"),
+        )
+        test_db.add(user)
+        await test_db.commit()
+        
+        response = await client.post(
+            "/api/v1/auth/login",
+            json={
+                "username": "legacyuser",
+                "password": "legacypass123"
+            }
+        )
+        assert response.status_code == 200
+        
+        await test_db.refresh(user)
+        assert user.password_hash.startswith("$argon2id$")
 
 class TestGetMe:
     """Test get current user endpoint"""
@@ -5,7 +5,7 @@ invalid user scenarios, authorization header edge cases, and concurrent authenti
 import pytest
 from datetime import datetime, timedelta
 from httpx import AsyncClient
-from jose import jwt
+import jwt
 from app.core.config import settings
 from app.core import security
 from app.models.user import User
@@ -173,12 +173,12 @@ class TestConcurrentScoreSubmissions:
         user1 = User(
             username="user1",
             email="user1@example.com",
-            password_hash=security.get_password_hash("pass123")
+            password_hash=await security.get_password_hash("pass123")
         )
         user2 = User(
             username="user2",
             email="user2@example.com",
-            password_hash=security.get_password_hash("pass123")
+            password_hash=await security.get_password_hash("pass123")
         )
         test_db.add(user1)
         test_db.add(user2)
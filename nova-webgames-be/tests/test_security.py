@@ -4,33 +4,111 @@ from app.core import security
 class TestPasswordHashing:
     """Test password hashing and verification"""
     
-    def test_hash_password(self):
+    @pytest.mark.asyncio
+    async def test_hash_password(self):
         """Test password hashing"""
         password = "testpassword123"
-        hashed = security.get_password_hash(password)
+        hashed = await security.get_password_hash(password)
         assert hashed != password
         assert len(hashed) > 0
+        assert hashed.startswith("$argon2id$")
     
-    def test_verify_password_correct(self):
+    @pytest.mark.asyncio
+    async def test_verify_password_correct(self):
         """Test verifying correct password"""
         password = "testpassword123"
-        hashed = security.get_password_hash(password)
-        assert security.verify_password(password, hashed) is True
+        hashed = await security.get_password_hash(password)
+        assert await security.verify_password(password, hashed) is True
     
-    def test_verify_password_incorrect(self):
+    @pytest.mark.asyncio
+    async def test_verify_password_incorrect(self):
         """Test verifying incorrect password"""
         password = "testpassword123"
         wrong_password = "wrongpassword"
-        hashed = security.get_password_hash(password)
-        assert security.verify_password(wrong_password, hashed) is False
+        hashed = await security.get_password_hash(password)
+        assert await security.verify_password(wrong_password, hashed) is False
     
-    def test_hash_different_passwords_different_hashes(self):
+    @pytest.mark.asyncio
+    async def test_hash_different_passwords_different_hashes(self):
         """Test that different passwords produce different hashes"""
         password1 = "password1"
         password2 = "password2"
-        hashed1 = security.get_password_hash(password1)
-        hashed2 = security.get_password_hash(password2)
+        hashed1 = await security.get_password_hash(password1)
+        hashed2 = await security.get_password_hash(password2)
         assert hashed1 != hashed2
+    
+    @pytest.mark.asyncio
+    async def test_hash_password_batch(self):
+        """Test hashing several passwords at once keeps input order"""
+        passwords = ["password1", "password2", "password3"]
+        hashes = await security.get_password_hash_batch(passwords)
+        assert len(hashes) == len(passwords)
+        for password, hashed in zip(passwords, hashes):
+            assert await security.verify_password(password, hashed) is True
+        assert await security.get_password_hash_batch([]) == []
+    
+    @pytest.mark.asyncio
+    async def test_hash_password_uses_configured_rounds(self, monkeypatch):
+        """Test that the bcrypt cost factor comes from settings"""
+        from app.core.config import settings
+        monkeypatch.setattr(
+            security, "settings",
+            settings.model_copy(update={"PASSWORD_HASH_SCHEME": "bcrypt", "BCRYPT_ROUNDS": 4}),
+        )
+        hashed = await security.get_password_hash("testpassword123")
+        assert hashed.startswith("$2b$04$")
+        assert await security.verify_password("testpassword123", hashed) is True
+    
+    def test_gensalt_matches_bcrypt_format(self):
+        """Test that pooled salts are valid, unique bcrypt salts"""
+        import bcrypt
+        salts = {security._gensalt(4) for _ in range(300)}
+        assert len(salts) == 300
+        for salt in salts:
+            assert salt.startswith(b"$2b$04$")
+            assert len(salt) == len(bcrypt.gensalt(rounds=4))
+        hashed = bcrypt.hashpw(b"testpassword123", salt)
+        assert bcrypt.checkpw(b"testpassword123", hashed)
+    
+    def test_gensalt_rejects_invalid_rounds(self):
+        """Test that out-of-range rounds still raise like bcrypt.gensalt"""
+        with pytest.raises(ValueError):
+            security._gensalt(3)
+    
+    @pytest.mark.asyncio
+    async def test_verify_legacy_bcrypt_hash(self):
+        """Test that bcrypt hashes still verify and are flagged for rehash"""
+        import bcrypt
+        hashed = bcrypt.hashpw(b"testpassword123", bcrypt.gensalt(rounds=4)).decode("utf-8")
+        assert await security.verify_password("testpassword123", hashed) is True
+        assert await security.verify_password("wrongpassword", hashed) is False
+        assert security.password_needs_rehash(hashed) is True
+    
+    @pytest.mark.asyncio
+    async def test_password_needs_rehash_current_hash(self):
+        """Test that hashes from the current scheme are not flagged for rehash"""
+        hashed = await security.get_password_hash("testpassword123")
+        assert security.password_needs_rehash(hashed) is False
+    
+    @pytest.mark.asyncio
+    async def test_argon2_backends_interchangeable(self, monkeypatch):
+        """Test that libsodium and argon2-cffi hashes verify with either backend"""
+        if not security.NACL_AVAILABLE:
+            pytest.skip("PyNaCl not installed")
+        nacl_hash = await security.get_password_hash("testpassword123")
+        monkeypatch.setattr(security, "NACL_AVAILABLE", False)
+        cffi_hash = await security.get_password_hash("testpassword123")
+        assert await security.verify_password("testpassword123", nacl_hash) is True
+        assert security.password_needs_rehash(nacl_hash) is False
+        monkeypatch.setattr(security, "NACL_AVAILABLE", True)
+        assert await security.verify_password("testpassword123", cffi_hash) is True
+        assert await security.verify_password("wrongpassword", cffi_hash) is False
+    
+    @pytest.mark.asyncio
+    async def test_verify_password_malformed_hash(self):
+        """Test that malformed hashes fail verification instead of raising"""
+        assert await security.verify_password("testpassword123", "not-a-hash") is False
+        assert await security.verify_password("testpassword123", "$argon2id$garbage") is False
 
 class TestJWT:
     """Test JWT token creation and validation"""
@@ -53,7 +131,7 @@ class TestJWT:
     
     def test_decode_access_token(self):
         """Test decoding access token"""
-        from jose import jwt
+        import jwt
         from app.core.config import settings
         
         user_id = "test-user-id"
@@ -65,3 +143,130 @@ class TestJWT:
         assert payload["sub"] == user_id
         assert "exp" in payload
 
+    
+    def test_create_access_token_reuses_token_within_bucket(self, monkeypatch):
+        """Test that tokens for the same subject and expiry window are reused"""
+        import jwt
+        bucket = security.TOKEN_EXP_BUCKET_SECONDS
+        # Start one second into a bucket so the whole window stays inside it
+        start = 1_700_000_000 - 1_700_000_000 % bucket - security._ACCESS_TOKEN_EXPIRE_SECONDS + 1
+        
+        monkeypatch.setattr(security.time, "time", lambda: float(start))
+        token1 = security.create_access_token("test-user-id")
+        monkeypatch.setattr(security.time, "time", lambda: float(start + bucket - 1))
+        token2 = security.create_access_token("test-user-id")
+        monkeypatch.setattr(security.time, "time", lambda: float(start + bucket))
+        token3 = security.create_access_token("test-user-id")
+        
+        assert token1 == token2
+        assert token3 != token1
+        exp = jwt.decode(token1, options={"verify_signature": False})["exp"]
+        assert exp % bucket == 0
+        assert exp >= start + bucket - 1 + security._ACCESS_TOKEN_EXPIRE_SECONDS
+    
+    def test_create_access_token_never_shorter_than_requested(self):
+        """Test that a short expires_delta still gives a token that verifies right away"""
+        import time
+        from datetime import timedelta
+        
+        for seconds in (5, 10):
+            for _ in range(30):
+                now = int(time.time())
+                token = security.create_access_token(
+                    "test-user-id", expires_delta=timedelta(seconds=seconds)
+                )
+                payload = security.verify_access_token(token)
+                assert payload["exp"] >= now + seconds
+    
+    def test_create_access_token_explicit_expiry_not_bucketed(self, monkeypatch):
+        """Test that an explicit expires_delta keeps its exact expiry"""
+        import jwt
+        from datetime import timedelta
+        
+        monkeypatch.setattr(security.time, "time", lambda: 1_700_000_000.5)
+        token = security.create_access_token("test-user-id", expires_delta=timedelta(seconds=7))
+        assert jwt.decode(token, options={"verify_signature": False})["exp"] == 1_700_000_008
+    
+    def test_create_access_token_matches_pyjwt(self):
+        """Test that hand-signed tokens are identical to PyJWT's output"""
+        import jwt
+        from app.core.config import settings
+        
+        token = security.create_access_token("test-user-id")
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+        assert token == jwt.encode(payload, settings.SECRET_KEY, algorithm=security.ALGORITHM)
+        assert jwt.get_unverified_header(token) == {"alg": "HS256", "typ": "JWT"}
+    
+    def test_verify_access_token(self):
+        """Test verifying access token returns claims"""
+        user_id = "test-user-id"
+        token = security.create_access_token(user_id)
+        
+        payload = security.verify_access_token(token)
+        assert payload["sub"] == user_id
+        assert "exp" in payload
+        # Second call is served from the cache and returns the same claims
+        assert security.verify_access_token(token) == payload
+    
+    def test_verify_access_token_cached_claims_not_shared(self):
+        """Test that mutating returned claims does not affect the cache"""
+        token = security.create_access_token("test-user-id")
+        payload = security.verify_access_token(token)
+        payload["sub"] = "someone-else"
+        assert security.verify_access_token(token)["sub"] == "test-user-id"
+    
+    def test_verify_access_token_rejects_non_object_payload(self):
+        """Test that a correctly signed token whose payload is not an object is rejected"""
+        import jwt
+        from app.core.config import settings
+        token = jwt.api_jws.encode(b"[1, 2]", settings.SECRET_KEY, algorithm=security.ALGORITHM)
+        with pytest.raises(jwt.DecodeError):
+            security.verify_access_token(token)
+    
+    def test_verify_access_token_invalid(self):
+        """Test verifying tampered and expired tokens raises"""
+        from datetime import timedelta
+        from jwt import InvalidTokenError
+        
+        token = security.create_access_token("test-user-id")
+        with pytest.raises(InvalidTokenError):
+            security.verify_access_token(token[:-2] + "xx")
+        
+        expired = security.create_access_token("test-user-id", expires_delta=timedelta(minutes=-1))
+        with pytest.raises(InvalidTokenError):
+            security.verify_access_token(expired)
+
+class TestSettings:
+    """Test settings construction"""
+    
+    def test_get_settings_is_cached(self):
+        """Test that get_settings returns the shared settings instance"""
+        from app.core.config import get_settings, settings
+        assert get_settings() is settings
+    
+    def test_settings_are_frozen(self):
+        """Test that settings cannot be mutated at runtime"""
+        from pydantic import ValidationError
+        from app.core.config import settings
+        with pytest.raises(ValidationError):
+            settings.BCRYPT_ROUNDS = 4
+    
+    @pytest.mark.parametrize("rounds", [3, 32])
+    def test_bcrypt_rounds_out_of_range_rejected(self, rounds):
+        """Test that an invalid BCRYPT_ROUNDS fails when settings load"""
+        from pydantic import ValidationError
+        from app.core.config import Settings
+        with pytest.raises(ValidationError):
+            Settings(BCRYPT_ROUNDS=rounds)
+    
+    def test_cors_origins_split_once(self):
+        """Test that CORS_ORIGINS is pre-split into a tuple"""
+        from app.core.config import Settings
+        custom = Settings(CORS_ORIGINS="https://a.example.com, https://b.example.com,")
+        assert custom.CORS_ORIGINS_LIST == ("https://a.example.com", "https://b.example.com")
+        assert Settings(CORS_ORIGINS="*").CORS_ORIGINS_LIST == ("*",)
+    
+    def test_cors_origins_empty_uses_dev_defaults(self):
+        """Test that an empty CORS_ORIGINS falls back to localhost origins"""
+        from app.core.config import Settings
+        assert "http://localhost:5173" in Settings(CORS_ORIGINS="").CORS_ORIGINS_LIST
@@ -4,7 +4,7 @@ Advanced security tests for SQL injection, XSS, token tampering, and authorizati
 import pytest
 from datetime import datetime, timedelta
 from httpx import AsyncClient
-from jose import jwt
+import jwt
 from app.core.config import settings
 from app.core import security
 
@@ -185,7 +185,7 @@ class TestTokenTampering:
     async def test_token_with_wrong_algorithm_rejected(self, client: AsyncClient, test_user):
         """Test that tokens with wrong algorithm are rejected"""
         # Create a token with wrong algorithm (if possible)
-        # Note: jose library may prevent this, but we test the behavior
+        # Note: the JWT library may prevent this, but we test the behavior
         try:
             fake_token = jwt.encode(
                 {"sub": "fake-user-id", "exp": datetime.utcnow() + timedelta(minutes=30)},